@@ -2,18 +2,36 @@ import os
 import json
 import time
 import random
+import itertools
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import re
 from datetime import datetime
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, Response, g, render_template, request, session, stream_with_context
+from itsdangerous import BadData, URLSafeTimedSerializer
+from flask.json.provider import JSONProvider
+from flask_compress import Compress
 from dotenv import load_dotenv
-from collections import OrderedDict
 import urllib.parse
 import uuid
 from threading import Lock
-import threading
 import secrets
+import sys
 import logging
+import gc
+import orjson
+from hashlib import blake2b
+
+try:
+    import ahocorasick  # optional: faster multi-keyword matching
+except ImportError:
+    ahocorasick = None
+
+try:
+    import redis  # optional: state shared across gunicorn workers
+except ImportError:
+    redis = None
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -22,7 +40,13 @@ logger = logging.getLogger(__name__)
 # Load environment
 load_dotenv()
 GROQ_KEY = os.getenv("GROQ_API_KEY")
-SECRET_KEY = os.getenv("SECRET_KEY", secrets.token_hex(32))
+REDIS_URL = os.getenv("REDIS_URL")
+SECRET_KEY = os.getenv("SECRET_KEY")
+if not SECRET_KEY:
+    # Per-process key: sessions and memory tokens won't survive a restart or
+    # validate in another worker
+    logger.warning("SECRET_KEY is not set; using a random per-process key")
+    SECRET_KEY = secrets.token_hex(32)
 app = Flask(__name__)
 app.secret_key = SECRET_KEY
 START_TIME = time.time()
@@ -30,110 +54,238 @@ START_TIME = time.time()
 # ===== PRODUCTION SETTINGS =====
 debug_mode = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
 app.config.update(
-    JSONIFY_PRETTYPRINT_REGULAR=False,
     SESSION_COOKIE_SECURE=not debug_mode,
     SESSION_COOKIE_HTTPONLY=True,
     SESSION_COOKIE_SAMESITE='Lax',
     MAX_CONTENT_LENGTH=16 * 1024 * 1024,
-    PERMANENT_SESSION_LIFETIME=1800
+    PERMANENT_SESSION_LIFETIME=1800,
+    # Response compression (LLM text compresses well); text/event-stream is
+    # deliberately not listed so SSE chunks aren't held back in the compressor
+    COMPRESS_ALGORITHM=['br', 'gzip'],
+    COMPRESS_BR_LEVEL=4,
+    COMPRESS_LEVEL=4,
+    COMPRESS_MIN_SIZE=512,
+    COMPRESS_MIMETYPES=['application/json', 'text/html']
 )
+Compress(app)
+
+# ===== JSON RESPONSES =====
+class ORJSONProvider(JSONProvider):
+    """Route Flask's JSON handling (request.get_json, jsonify) through orjson"""
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+app.json = ORJSONProvider(app)
+
+def json_response(obj, status=200):
+    """Build a JSON response with orjson (encodes straight to bytes)"""
+    return app.response_class(orjson.dumps(obj), status=status, mimetype='application/json')
+
+# ===== SHARED HTTP CLIENT =====
+# One pooled session keeps TCP/TLS connections to Groq and the dictionary API
+# alive between requests instead of handshaking on every call
+http_session = requests.Session()
+http_session.mount('https://', HTTPAdapter(
+    pool_connections=20,
+    pool_maxsize=50,
+    # connect=0: connect errors are retried for every method, POST included, so a
+    # dead upstream would hold the worker for three connect timeouts instead of one
+    max_retries=Retry(total=2, connect=0, backoff_factor=0.2, status_forcelist=[502, 503, 504])
+))
+http_session.headers.update({"Content-Type": "application/json"})
+
+# ===== REDIS (OPTIONAL) =====
+redis_client = None
+if REDIS_URL:
+    if redis is None:
+        logger.warning("REDIS_URL is set but the redis package is missing; using in-process state")
+    else:
+        redis_client = redis.Redis.from_url(REDIS_URL, socket_timeout=1)
 
 # ===== THREAD-SAFE RATE LIMITING =====
 class RateLimiter:
-    """Thread-safe rate limiter"""
-    def __init__(self, window=60, max_requests=30):
+    """Thread-safe token-bucket rate limiter, sharded by IP to spread lock contention"""
+    def __init__(self, window=60, max_requests=30, shards=32):
         self.window = window
         self.max_requests = max_requests
-        self.requests = {}
-        self.lock = Lock()
-        self.cleanup_interval = 300  # 5 minutes
-        self.last_cleanup = time.time()
+        self.refill_rate = max_requests / window  # tokens per second
+        self.shards = [{} for _ in range(shards)]  # ip -> (tokens, last_refill)
+        self.locks = [Lock() for _ in range(shards)]
+        self.max_buckets = 10000 // shards  # sweep a shard's idle buckets past this size
+        self.last_sweep = [time.monotonic()] * shards  # per shard, so a full shard sweeps once per window
     
     def is_limited(self, ip):
-        with self.lock:
-            now = time.time()
-            
-            # Periodic cleanup
-            if now - self.last_cleanup > self.cleanup_interval:
-                self._cleanup(now)
-                self.last_cleanup = now
+        index = hash(ip) % len(self.shards)
+        buckets = self.shards[index]
+        with self.locks[index]:
+            now = time.monotonic()
             
-            if ip not in self.requests:
-                self.requests[ip] = []
+            bucket = buckets.get(ip)
+            if bucket is None:
+                # Sweeps are O(shard): only new IPs trigger one, at most once per
+                # window, so a shard full of live buckets isn't rescanned per call
+                if len(buckets) > self.max_buckets and now - self.last_sweep[index] >= self.window:
+                    self.last_sweep[index] = now
+                    self._cleanup(buckets, now)
+                bucket = (self.max_requests, now)
             
-            # Remove old requests
-            self.requests[ip] = [t for t in self.requests[ip] if now - t < self.window]
+            tokens, last_refill = bucket
+            tokens = min(self.max_requests, tokens + (now - last_refill) * self.refill_rate)
             
-            if len(self.requests[ip]) >= self.max_requests:
+            if tokens < 1:
+                buckets[ip] = (tokens, now)
                 return True
             
-            self.requests[ip].append(now)
+            buckets[ip] = (tokens - 1, now)
             return False
     
-    def _cleanup(self, current_time):
-        """Remove old entries"""
-        expired_ips = []
-        for ip, timestamps in self.requests.items():
-            # Keep only recent timestamps
-            self.requests[ip] = [t for t in timestamps if current_time - t < self.window * 2]
-            if not self.requests[ip]:
-                expired_ips.append(ip)
+    def _cleanup(self, buckets, current_time):
+        """Remove buckets that have fully refilled (same as having no entry)"""
+        expired_ips = [
+            ip for ip, (_, last_refill) in buckets.items()
+            if current_time - last_refill >= self.window
+        ]
         
         for ip in expired_ips:
-            del self.requests[ip]
+            del buckets[ip]
 
-rate_limiter = RateLimiter()
+class RedisRateLimiter:
+    """Token-bucket rate limiter shared by all workers through Redis"""
+    # Same bucket as RateLimiter, kept in a hash and updated atomically;
+    # uses the Redis clock so every worker and host agrees on "now"
+    SCRIPT = """
+    local max_tokens = tonumber(ARGV[1])
+    local refill_rate = tonumber(ARGV[2])
+    local now_parts = redis.call('TIME')
+    local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(bucket[1]) or max_tokens
+    local last_refill = tonumber(bucket[2]) or now
+    tokens = math.min(max_tokens, tokens + (now - last_refill) * refill_rate)
+    local limited = 0
+    if tokens < 1 then
+        limited = 1
+    else
+        tokens = tokens - 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+    return limited
+    """
+    
+    def __init__(self, client, window=60, max_requests=30):
+        self.window = window
+        self.max_requests = max_requests
+        self.refill_rate = max_requests / window
+        self.script = client.register_script(self.SCRIPT)  # runs via EVALSHA
+        self.fallback = RateLimiter(window, max_requests)
+    
+    def is_limited(self, ip):
+        try:
+            return bool(self.script(
+                keys=[f"ratelimit:{ip}"],
+                args=[self.max_requests, self.refill_rate, self.window]
+            ))
+        except redis.RedisError as e:
+            logger.error(f"Redis rate limit error: {e}")
+            return self.fallback.is_limited(ip)
+
+rate_limiter = RedisRateLimiter(redis_client) if redis_client else RateLimiter()
 
 # ===== SIZE-LIMITED CACHE SYSTEM =====
 class LRUCache:
-    """Thread-safe LRU cache with size limit"""
+    """Thread-safe LRU cache with size limit
+    
+    Values and timestamps live in two plain dicts. `values` is kept in
+    recency order (pop and re-insert on a hit), `times` in write order, so
+    the first key of each is the least recently used / the oldest write.
+    Expired entries go lazily on get, and in small batches from set once the
+    cache is nearly full.
+    """
+    sweep_batch = 32  # max expired entries dropped per opportunistic sweep
+    sweep_interval = 60  # seconds between opportunistic sweeps
+    
     def __init__(self, maxsize=1000, ttl=300):
-        self.cache = OrderedDict()
+        self.values = {}
+        self.times = {}
         self.maxsize = maxsize
         self.ttl = ttl
         self.lock = Lock()
+        self._last_sweep = time.monotonic()
     
     def get(self, key):
         with self.lock:
-            if key not in self.cache:
+            timestamp = self.times.get(key)
+            if timestamp is None:
                 return None
-                
-            timestamp, value = self.cache[key]
-            if time.time() - timestamp > self.ttl:
-                del self.cache[key]
+            
+            if time.monotonic() - timestamp > self.ttl:
+                del self.values[key]
+                del self.times[key]
                 return None
-                
-            # Move to end (most recently used)
-            self.cache.move_to_end(key)
+            
+            # Re-insert at the end (most recently used)
+            value = self.values.pop(key)
+            self.values[key] = value
             return value
     
     def set(self, key, value):
         with self.lock:
-            # Check and cleanup if needed
-            if len(self.cache) >= self.maxsize:
-                # Remove oldest entry
-                self.cache.popitem(last=False)
+            if key in self.times:
+                # Overwrite: drop the old slot in both orders
+                del self.values[key]
+                del self.times[key]
+            elif len(self.values) >= self.maxsize:
+                # Remove least recently used entry
+                oldest = next(iter(self.values))
+                del self.values[oldest]
+                del self.times[oldest]
             
-            self.cache[key] = (time.time(), value)
-    
-    def cleanup(self):
-        """Remove expired entries"""
-        with self.lock:
-            current_time = time.time()
-            expired_keys = []
-            for key, (timestamp, _) in self.cache.items():
-                if current_time - timestamp > self.ttl:
-                    expired_keys.append(key)
+            now = time.monotonic()
+            self.values[key] = value
+            self.times[key] = now
             
-            for key in expired_keys:
-                del self.cache[key]
+            # Near the size limit, clear a few expired slots before LRU has to evict live ones
+            if len(self.values) > self.maxsize * 0.9 and now - self._last_sweep > self.sweep_interval:
+                self._last_sweep = now
+                self._sweep(now, self.sweep_batch)
+    
+    def _sweep(self, current_time, limit):
+        """Remove expired entries, oldest writes first (caller holds the lock)
+        
+        `times` is in write order, so the sweep stops at the first live entry
+        and costs O(expired) rather than O(size).
+        """
+        removed = 0
+        while self.times and removed < limit:
+            key = next(iter(self.times))
+            if current_time - self.times[key] <= self.ttl:
+                break
+            del self.times[key]
+            del self.values[key]
+            removed += 1
     
     def __len__(self):
-        return len(self.cache)
+        return len(self.values)
 
 # Initialize caches
 response_cache = LRUCache(maxsize=500, ttl=300)
 definition_cache = LRUCache(maxsize=200, ttl=3600)
+definition_miss_cache = LRUCache(maxsize=2048, ttl=600)  # words the dictionary 404'd
+
+# ===== TIMESTAMPS =====
+_iso_cache = (None, '')  # (second, isoformat string)
+
+def now_iso():
+    """Current local time in ISO format, formatted at most once per second"""
+    global _iso_cache
+    now = int(time.time())
+    if _iso_cache[0] != now:
+        _iso_cache = (now, datetime.fromtimestamp(now).isoformat())
+    return _iso_cache[1]
 
 # ===== SESSION-BASED MEMORY =====
 def get_user_id():
@@ -145,41 +297,86 @@ def get_user_id():
     return session['user_id']
 
 def get_memory_key():
-    """Get memory storage key for current user"""
-    return f"memory:{get_user_id()}"
+    """Get memory storage key for current user (set once per request)"""
+    if 'memory_key' not in g:
+        g.memory_key = f"memory:{get_user_id()}"
+    return g.memory_key
+
+def load_user_memory():
+    """Load the current user's exchanges, oldest first"""
+    memory_key = get_memory_key()
+    if redis_client is None:
+        return session.get(memory_key, [])
+    
+    try:
+        return [orjson.loads(entry) for entry in redis_client.lrange(memory_key, 0, -1)]
+    except redis.RedisError as e:
+        logger.error(f"Redis memory read error: {e}")
+        return []
 
 def update_user_memory(user_message, ai_response):
-    """Update user's conversation memory (max 5 exchanges)"""
+    """Update user's conversation memory (max 5 exchanges)
+    
+    Stored in Redis when REDIS_URL is configured, so the session cookie only
+    carries the user id; otherwise kept in the session itself.
+    """
     memory_key = get_memory_key()
+    # Stored compactly as [user, assistant, timestamp]
+    entry = [user_message[:500], ai_response[:500], now_iso()]
+    g.pop('history', None)  # formatted history is stale now
+    
+    if redis_client is not None:
+        try:
+            pipe = redis_client.pipeline()
+            pipe.rpush(memory_key, orjson.dumps(entry))
+            pipe.ltrim(memory_key, -5, -1)  # keep only last 5 exchanges
+            pipe.expire(memory_key, app.config['PERMANENT_SESSION_LIFETIME'])
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.error(f"Redis memory write error: {e}")
+        return
+    
     memory = session.get(memory_key, [])
+    memory.append(entry)
     
     # Keep only last 5 exchanges
-    memory.append({
-        "user": user_message[:500],
-        "assistant": ai_response[:500],
-        "timestamp": datetime.now().isoformat()
-    })
-    
     if len(memory) > 5:
         memory = memory[-5:]
     
     session[memory_key] = memory
-    return memory
 
-def get_conversation_history():
-    """Get formatted conversation history"""
+def clear_user_memory():
+    """Forget the current user's conversation"""
     memory_key = get_memory_key()
-    memory = session.get(memory_key, [])
+    g.pop('history', None)
+    
+    if redis_client is not None:
+        try:
+            redis_client.delete(memory_key)
+        except redis.RedisError as e:
+            logger.error(f"Redis memory delete error: {e}")
+    session.pop(memory_key, None)
+
+# Signs streamed exchanges so /api/chat/remember only records replies we sent;
+# each token also carries a nonce kept in the session, so it works only once.
+# Tokens and cookies only validate across workers that share SECRET_KEY
+memory_signer = URLSafeTimedSerializer(SECRET_KEY, salt='memory')
+MEMORY_TOKEN_MAX_AGE = 300  # seconds
+
+def get_conversation_history():
+    """Get formatted conversation history (built once per request)"""
+    if 'history' in g:
+        return g.history
     
-    if not memory:
-        return ""
+    memory = load_user_memory()
     
     formatted = []
-    for exchange in memory[-3:]:  # Last 3 exchanges for context
-        formatted.append(f"User: {exchange['user']}")
-        formatted.append(f"Assistant: {exchange['assistant']}")
+    for user_message, ai_response, _ in memory[-3:]:  # Last 3 exchanges for context
+        formatted.append(f"User: {user_message}")
+        formatted.append(f"Assistant: {ai_response}")
     
-    return "\n".join(formatted)
+    g.history = "\n".join(formatted)
+    return g.history
 
 # ===== COMMON RESPONSES =====
 COMMON_RESPONSES = {
@@ -197,30 +394,124 @@ COMMON_RESPONSES = {
     'joke': ["Why don't scientists trust atoms? Because they make up everything! 😂"],
     'lol': ["Glad I could make you laugh! 😂"],
     'ok': ["Okurrr! 💅", "Okie dokie! 👍"],
-    'time': [f"It's {datetime.now().strftime('%I:%M %p')} ⏰"],
-    'date': [f"Today is {datetime.now().strftime('%B %d, %Y')} 📅"],
+    'time': ["It's %I:%M %p ⏰"],  # strftime templates, see clock_response()
+    'date': ["Today is %B %d, %Y 📅"],
     'name': ["I'm Miss Tristin! The sassiest AI you'll meet 💅"],
     'weather': ["I'm not a weather app, but I'm always sunny inside! ☀️"],
     'help': ["I can chat, define words, write essays! What do you need? 😏"],
 }
 
+# Used when the AI comes back empty
+FALLBACK_RESPONSES = [
+    "Interesting! Tell me more 😏",
+    "Hmm, I'm listening... go on 💅",
+    "Okay, and? I need more details 👀",
+]
+
+# ===== CLOCK RESPONSES =====
+CLOCK_KEYS = ('time', 'date')
+_clock_cache = {}  # key -> (second, formatted reply)
+
+def clock_response(key):
+    """Format a time/date reply for now, at most once per second"""
+    now = int(time.time())
+    cached = _clock_cache.get(key)
+    if cached and cached[0] == now:
+        return cached[1]
+    
+    reply = datetime.fromtimestamp(now).strftime(COMMON_RESPONSES[key][0])
+    _clock_cache[key] = (now, reply)
+    return reply
+
+# ===== REPLY ROTATION =====
+# Each reply list is shuffled once and then served round-robin; next() on a
+# cycle is a single C call, so threads can share them without a lock
+COMMON_REPLY_CYCLES = {
+    key: itertools.cycle(random.sample(replies, len(replies)))
+    for key, replies in COMMON_RESPONSES.items()
+    if key not in CLOCK_KEYS
+}
+FALLBACK_CYCLE = itertools.cycle(random.sample(FALLBACK_RESPONSES, len(FALLBACK_RESPONSES)))
+
+# ===== COMMON RESPONSE MATCHING =====
+# Keys frozen once for the pure-Python scans (tuple walk, interned strings)
+COMMON_KEYS = tuple(sys.intern(key) for key in COMMON_RESPONSES)
+
+def build_common_matcher():
+    """Build an Aho-Corasick automaton over COMMON_RESPONSES keys"""
+    if ahocorasick is None:
+        return None
+    
+    automaton = ahocorasick.Automaton()
+    for index, key in enumerate(COMMON_KEYS):
+        automaton.add_word(key, (index, key))
+    automaton.make_automaton()
+    return automaton
+
+common_matcher = build_common_matcher()
+
+def has_common_word(msg_lower):
+    """Check if any common key appears as a whole word in the message"""
+    padded = f' {msg_lower} '
+    if common_matcher is None:
+        return any(f' {key} ' in padded for key in COMMON_KEYS)
+    
+    for end, (_, key) in common_matcher.iter(padded):
+        start = end - len(key)
+        if padded[start] == ' ' and padded[end + 1] == ' ':
+            return True
+    return False
+
+def find_common_key(msg_lower):
+    """Find the first common key (in dict order) contained in the message"""
+    if common_matcher is None:
+        for key in COMMON_KEYS:
+            if key in msg_lower:
+                return key
+        return None
+    
+    hits = [hit for _, hit in common_matcher.iter(msg_lower)]
+    return min(hits)[1] if hits else None
+
+# ===== PRECOMPILED PATTERNS =====
+DEFINITION_PATTERNS = [
+    re.compile(r'(?:define|meaning of|what does|definition of|what is|tell me about)\s+([a-zA-Z]+(?:\s+[a-zA-Z]+)?)'),
+    re.compile(r'([a-zA-Z]+(?:\s+[a-zA-Z]+)?)\s+(?:means|meaning)'),
+]
+
+# Filler words that are never the word being asked about
+DEFINITION_STOPWORDS = frozenset({'the', 'and', 'for', 'you', 'me', 'is', 'are', 'of', 'to', 'in'})
+
+# All long-content patterns fused into one alternation: one scan per message
+LONG_CONTENT_RE = re.compile('|'.join([
+    r'write.*essay', r'essay about', r'explain.*in detail',
+    r'detailed explanation', r'summarize', r'analysis',
+    r'step by step', r'tutorial', r'guide', r'how to make',
+    r'paragraph about', r'tell me a story', r'create a poem',
+    r'compare.*and', r'list of', r'pros and cons'
+]))
+
 # ===== UTILITY FUNCTIONS =====
 def get_word_definition(word):
     """Get word definition with proper error handling"""
-    if not word or len(word) > 50:
+    if not word or len(word) > 50 or not word.isalpha():
         return None
     
+    not_found = f"Sorry, I couldn't find a definition for '{word}'. Try another word? 🤔"
+    
     # Check cache first
     cached = definition_cache.get(word.lower())
     if cached:
         return cached
+    if definition_miss_cache.get(word.lower()):
+        return not_found
     
     try:
         url = f"https://api.dictionaryapi.dev/api/v2/entries/en/{urllib.parse.quote(word)}"
-        response = requests.get(url, timeout=5)
+        response = http_session.get(url, timeout=(3, 5))
         
         if response.status_code == 200:
-            data = response.json()
+            data = orjson.loads(response.content)
             if isinstance(data, list) and data:
                 entry = data[0]
                 meanings = entry.get('meanings', [])
@@ -236,7 +527,9 @@ def get_word_definition(word):
                     definition_cache.set(word.lower(), result)
                     return result
         elif response.status_code == 404:
-            return f"Sorry, I couldn't find a definition for '{word}'. Try another word? 🤔"
+            # Remember the miss so repeats skip the round trip
+            definition_miss_cache.set(word.lower(), True)
+            return not_found
     except requests.exceptions.Timeout:
         return "The dictionary service is taking too long... ⏳"
     except Exception as e:
@@ -244,209 +537,206 @@ def get_word_definition(word):
     
     return None
 
-def extract_definition_word(message):
+def extract_definition_word(msg_lower):
     """Properly extract word for definition request"""
-    patterns = [
-        r'(?:define|meaning of|what does|definition of|what is|tell me about)\s+([a-zA-Z]+(?:\s+[a-zA-Z]+)?)',
-        r'([a-zA-Z]+(?:\s+[a-zA-Z]+)?)\s+(?:means|meaning)',
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, message.lower())
+    for pattern in DEFINITION_PATTERNS:
+        match = pattern.search(msg_lower)
         if match:
             word = match.group(1).strip()
-            # Filter out common words
-            common_words = {'the', 'and', 'for', 'you', 'me', 'is', 'are', 'of', 'to', 'in'}
             words = word.split()
             # Take the last word if multiple, as it's often the target
             target_word = words[-1] if len(words) > 1 else word
-            if len(target_word) > 2 and target_word not in common_words:
+            if len(target_word) > 2 and target_word not in DEFINITION_STOPWORDS:
                 return target_word
     
     return None
 
-def classify_message(message):
+def normalize_message(message):
+    """Lowercased stripped message, shared by the matchers below"""
+    # Whole message: a prefix cut could split a word and change the match
+    return message.lower()
+
+def classify_message(message, msg_lower):
     """Classify message type"""
-    msg_lower = message.lower().strip()
-    
     if len(message) > 1000:
         return 'long'
     
+    # Exact common match needs no regex work at all
+    if msg_lower in COMMON_RESPONSES:
+        return 'common'
+    
     # Check for definition requests
-    if extract_definition_word(message):
+    if extract_definition_word(msg_lower):
         return 'definition'
     
     # Check common responses
-    for key in COMMON_RESPONSES:
-        if key == msg_lower or f' {key} ' in f' {msg_lower} ':
-            return 'common'
+    if has_common_word(msg_lower):
+        return 'common'
     
     # Long content patterns
-    long_patterns = [
-        r'write.*essay', r'essay about', r'explain.*in detail',
-        r'detailed explanation', r'summarize', r'analysis',
-        r'step by step', r'tutorial', r'guide', r'how to make',
-        r'paragraph about', r'tell me a story', r'create a poem',
-        r'compare.*and', r'list of.*', r'pros and cons'
-    ]
-    
-    for pattern in long_patterns:
-        if re.search(pattern, msg_lower):
-            return 'long'
+    if LONG_CONTENT_RE.search(msg_lower):
+        return 'long'
     
     return 'normal'
 
-def get_common_response(message):
+def get_common_response(msg_lower):
     """Get cached common response"""
-    msg_lower = message.lower().strip()
-    
-    # Exact match
-    if msg_lower in COMMON_RESPONSES:
-        return random.choice(COMMON_RESPONSES[msg_lower])
-    
-    # Contains match
-    for key, responses in COMMON_RESPONSES.items():
-        if key in msg_lower:
-            return random.choice(responses)
+    # Exact match, then contains match
+    key = msg_lower if msg_lower in COMMON_RESPONSES else find_common_key(msg_lower)
+    if not key:
+        return None
     
-    return None
+    if key in CLOCK_KEYS:
+        return clock_response(key)
+    return next(COMMON_REPLY_CYCLES[key])
 
-# ===== PERIODIC CLEANUP =====
-def cleanup_task():
-    """Background cleanup task"""
-    while True:
-        time.sleep(300)  # Run every 5 minutes
-        try:
-            response_cache.cleanup()
-            definition_cache.cleanup()
-            rate_limiter._cleanup(time.time())
-            logger.debug("Cleanup completed")
-        except Exception as e:
-            logger.error(f"Cleanup error: {e}")
+# ===== AI SERVICE =====
+# System prompts; {history} is swapped for the recent conversation per call
+LONG_SYSTEM_PROMPT = """You are Miss Tristin, a sassy but helpful AI assistant.
 
-# Start cleanup thread
-cleanup_thread = threading.Thread(target=cleanup_task, daemon=True)
-cleanup_thread.start()
+Recent conversation context:
+{history}
+
+Guidelines:
+1. Provide detailed, helpful responses (200-400 words)
+2. Maintain a witty, engaging personality
+3. Reference previous conversation if relevant
+4. Be informative but entertaining
+5. Use occasional emojis (1-2 max)"""
+
+SHORT_SYSTEM_PROMPT = """You are Miss Tristin, a sassy AI assistant with personality.
+
+Recent conversation context:
+{history}
+
+Guidelines:
+1. Keep responses concise and clever (under 100 words)
+2. Stay in character: confident, witty, helpful
+3. Use 0-1 emoji per response
+4. Be engaging but professional"""
 
-# ===== AI SERVICE =====
 class AIService:
     def __init__(self):
         self.groq_key = GROQ_KEY
         self.model = "llama-3.1-8b-instant"
+        self.headers = {"Authorization": f"Bearer {self.groq_key}"}
+        
+        # Static sampling settings per reply length; only messages vary per call
+        self.long_payload = {"model": self.model, "temperature": 0.7, "max_tokens": 600, "top_p": 0.9}
+        self.short_payload = {"model": self.model, "temperature": 0.8, "max_tokens": 150, "top_p": 0.9}
         
     def get_response(self, message, user_ip):
         """Get AI response with proper memory and caching"""
         message = message.strip()
+        response, msg_type = self.get_quick_response(message, user_ip)
+        if response:
+            return response
+        
+        # Get AI response
+        response = self._get_ai_response(message, msg_type)
+        if response:
+            update_user_memory(message, response)
+            return response
+        
+        # Fallback
+        response = next(FALLBACK_CYCLE)
+        update_user_memory(message, response)
+        return response
+    
+    def get_quick_response(self, message, user_ip):
+        """Answer without the LLM when possible; returns (response, msg_type)"""
         if not message:
-            return "You sent me nothing! How rude! 😒"
+            return "You sent me nothing! How rude! 😒", None
         
         if len(message) > 5000:
-            return "That's way too long for me! TL;DR please! 😴"
+            return "That's way too long for me! TL;DR please! 😴", None
         
         # Rate limiting
         if rate_limiter.is_limited(user_ip):
-            return "Whoa slow down! I need to breathe too 😅 Try again in a minute!"
+            return "Whoa slow down! I need to breathe too 😅 Try again in a minute!", None
         
         # Classify message
-        msg_type = classify_message(message)
+        msg_lower = normalize_message(message)
+        msg_type = classify_message(message, msg_lower)
         
         # Handle definitions
         if msg_type == 'definition':
-            word = extract_definition_word(message)
+            word = extract_definition_word(msg_lower)
             if word:
                 definition = get_word_definition(word)
                 if definition:
                     update_user_memory(message, definition)
-                    return definition
+                    return definition, msg_type
         
         # Handle common responses
         if msg_type == 'common':
-            response = get_common_response(message)
+            response = get_common_response(msg_lower)
             if response:
                 update_user_memory(message, response)
-                return response
-        
-        # Get AI response
-        response = self._get_ai_response(message, msg_type)
-        if response:
-            update_user_memory(message, response)
-            return response
+                return response, msg_type
         
-        # Fallback
-        fallbacks = [
-            "Interesting! Tell me more 😏",
-            "Hmm, I'm listening... go on 💅",
-            "Okay, and? I need more details 👀",
-        ]
-        response = random.choice(fallbacks)
-        update_user_memory(message, response)
-        return response
+        return None, msg_type
     
-    def _get_ai_response(self, message, msg_type):
-        """Get AI response from Groq"""
-        if not self.groq_key or self.groq_key == "your_groq_api_key_here":
-            return "API key not configured! Tell my creators to fix this! 🔧"
-        
-        # Get conversation history
-        history = get_conversation_history()
+    def _is_configured(self):
+        """Check the Groq API key is set to something real"""
+        return bool(self.groq_key) and self.groq_key != "your_groq_api_key_here"
+    
+    def cache_key(self, message, msg_type):
+        """Response cache key, or None when the reply depends on history"""
+        if get_conversation_history():
+            return None
+        normalized = " ".join(message.split())
+        return blake2b(f"{msg_type}|{normalized}".encode(), digest_size=16).hexdigest()
+    
+    def _build_payload(self, message, msg_type, stream=False):
+        """Build the Groq chat completion payload"""
+        history = get_conversation_history() or "No recent conversation."
         
         # Safe persona
         if msg_type == 'long':
-            system_prompt = f"""You are Miss Tristin, a sassy but helpful AI assistant.
-
-Recent conversation context:
-{history if history else "No recent conversation."}
-
-Guidelines:
-1. Provide detailed, helpful responses (200-400 words)
-2. Maintain a witty, engaging personality
-3. Reference previous conversation if relevant
-4. Be informative but entertaining
-5. Use occasional emojis (1-2 max)"""
-            max_tokens = 600
-            temperature = 0.7
+            system_prompt = LONG_SYSTEM_PROMPT.replace('{history}', history)
+            base_payload = self.long_payload
         else:
-            system_prompt = f"""You are Miss Tristin, a sassy AI assistant with personality.
-
-Recent conversation context:
-{history if history else "No recent conversation."}
-
-Guidelines:
-1. Keep responses concise and clever (under 100 words)
-2. Stay in character: confident, witty, helpful
-3. Use 0-1 emoji per response
-4. Be engaging but professional"""
-            max_tokens = 150
-            temperature = 0.8
+            system_prompt = SHORT_SYSTEM_PROMPT.replace('{history}', history)
+            base_payload = self.short_payload
         
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": message}
-        ]
-        
-        payload = {
-            "model": self.model,
-            "messages": messages,
-            "temperature": temperature,
-            "max_tokens": max_tokens,
-            "top_p": 0.9,
-            "stream": False
+        return {
+            **base_payload,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": message}
+            ],
+            "stream": stream
         }
+    
+    def _get_ai_response(self, message, msg_type):
+        """Get AI response from Groq"""
+        if not self._is_configured():
+            return "API key not configured! Tell my creators to fix this! 🔧"
+        
+        # Context-free prompts are shared across users
+        key = self.cache_key(message, msg_type)
+        if key:
+            cached = response_cache.get(key)
+            if cached:
+                return cached
+        
+        payload = self._build_payload(message, msg_type)
         
         try:
-            response = requests.post(
+            response = http_session.post(
                 "https://api.groq.com/openai/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {self.groq_key}",
-                    "Content-Type": "application/json"
-                },
-                json=payload,
-                timeout=20
+                headers=self.headers,
+                data=orjson.dumps(payload),
+                timeout=(3, 20)  # (connect, read)
             )
             
             if response.status_code == 200:
-                data = response.json()
-                return data["choices"][0]["message"]["content"].strip()
+                data = orjson.loads(response.content)
+                content = data["choices"][0]["message"]["content"].strip()
+                if key and content:
+                    response_cache.set(key, content)
+                return content
             elif response.status_code == 429:
                 return "Too many requests! Even I need a break sometimes! 😅"
             else:
@@ -457,6 +747,59 @@ Guidelines:
         except Exception as e:
             logger.error(f"AI API error: {e}")
             return "Oops! Something went wrong. Try again? 🔌"
+    
+    def stream_ai_response(self, message, msg_type):
+        """Yield Groq completion text as it is generated"""
+        if not self._is_configured():
+            yield "API key not configured! Tell my creators to fix this! 🔧"
+            return
+        
+        key = self.cache_key(message, msg_type)
+        if key:
+            cached = response_cache.get(key)
+            if cached:
+                yield cached
+                return
+        
+        payload = self._build_payload(message, msg_type, stream=True)
+        chunks = []
+        
+        try:
+            with http_session.post(
+                "https://api.groq.com/openai/v1/chat/completions",
+                headers=self.headers,
+                data=orjson.dumps(payload),
+                timeout=(3, 20),  # (connect, read between chunks)
+                stream=True
+            ) as response:
+                if response.status_code == 429:
+                    yield "Too many requests! Even I need a break sometimes! 😅"
+                    return
+                if response.status_code != 200:
+                    logger.error(f"Groq API error: {response.status_code}")
+                    yield "API error! Try again? 🔌"
+                    return
+                
+                # Server-sent events: "data: {...}" lines, ending with "data: [DONE]"
+                for line in response.iter_lines():
+                    if not line.startswith(b"data: "):
+                        continue
+                    data = line[6:]
+                    if data == b"[DONE]":
+                        # Only complete replies are cached
+                        content = "".join(chunks).strip()
+                        if key and content:
+                            response_cache.set(key, content)
+                        break
+                    delta = orjson.loads(data)["choices"][0]["delta"].get("content")
+                    if delta:
+                        chunks.append(delta)
+                        yield delta
+        except requests.exceptions.Timeout:
+            yield "Taking too long... try a shorter question? ⏳"
+        except Exception as e:
+            logger.error(f"AI API error: {e}")
+            yield "Oops! Something went wrong. Try again? 🔌"
 
 # Initialize AI service
 ai_service = AIService()
@@ -480,93 +823,185 @@ def chat_api():
     try:
         data = request.get_json()
         if not data:
-            return jsonify({"success": False, "error": "No data provided"}), 400
+            return json_response({"success": False, "error": "No data provided"}, 400)
         
         message = data.get('message', '').strip()
         if not message:
-            return jsonify({"success": False, "error": "Empty message"}), 400
+            return json_response({"success": False, "error": "Empty message"}, 400)
         
         user_ip = request.remote_addr
-        
-        # Small random delay for natural feel
-        delay = 0.1 + random.random() * 0.4
-        time.sleep(min(delay, 0.5))
-        
         response = ai_service.get_response(message, user_ip)
         
-        return jsonify({
+        return json_response({
             "success": True,
             "response": response,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": now_iso()
         })
     except Exception as e:
         logger.error(f"Chat endpoint error: {e}")
-        return jsonify({
+        return json_response({
             "success": False,
             "error": "Internal server error"
-        }), 500
+        }, 500)
+
+def sse_event(obj):
+    """Encode one server-sent event"""
+    return b"data: " + orjson.dumps(obj) + b"\n\n"
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream_api():
+    """Chat endpoint that streams the reply as server-sent events
+    
+    Events are {"delta": text} chunks followed by {"done": true}. With Redis
+    memory the exchange is recorded as the stream ends; with session memory
+    the cookie has already been sent, so the final event carries a signed
+    "memory" token that the client posts to /api/chat/remember.
+    """
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data, dict):
+        return json_response({"success": False, "error": "No data provided"}, 400)
+    
+    message = data.get('message', '')
+    message = message.strip() if isinstance(message, str) else ''
+    if not message:
+        return json_response({"success": False, "error": "Empty message"}, 400)
+    
+    # Quick answers update memory right here, before the cookie goes out
+    response, msg_type = ai_service.get_quick_response(message, request.remote_addr)
+    user_id = get_user_id()
+    
+    # Session memory: remember which exchange the token may record
+    nonce = None
+    if not response and redis_client is None:
+        nonce = session['memory_nonce'] = secrets.token_urlsafe(8)
+    
+    def generate():
+        if response:
+            yield sse_event({"delta": response})
+            yield sse_event({"done": True})
+            return
+        
+        chunks = []
+        for chunk in ai_service.stream_ai_response(message, msg_type):
+            chunks.append(chunk)
+            yield sse_event({"delta": chunk})
+        
+        reply = "".join(chunks).strip()
+        if not reply:
+            reply = next(FALLBACK_CYCLE)
+            yield sse_event({"delta": reply})
+        
+        if redis_client is not None:
+            update_user_memory(message, reply)
+            yield sse_event({"done": True})
+        else:
+            token = memory_signer.dumps([user_id, nonce, message, reply])
+            yield sse_event({"done": True, "memory": token})
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.route('/api/chat/remember', methods=['POST'])
+def remember_exchange():
+    """Record a streamed exchange using the token from its final event"""
+    data = request.get_json(silent=True)
+    token = data.get('memory') if isinstance(data, dict) else None
+    
+    user_id = nonce = None
+    if isinstance(token, str):
+        try:
+            user_id, nonce, message, reply = memory_signer.loads(token, max_age=MEMORY_TOKEN_MAX_AGE)
+        except BadData:
+            pass
+    
+    if user_id != get_user_id() or nonce is None or nonce != session.get('memory_nonce'):
+        return json_response({"success": False, "error": "Invalid memory token"}, 400)
+    
+    session.pop('memory_nonce')  # single use
+    update_user_memory(message, reply)
+    return json_response({"success": True})
+
+_stats_cache = (None, b'')  # (second, encoded stats body)
 
 @app.route('/api/stats')
 def stats():
-    """Get server stats"""
-    uptime = int(time.time() - START_TIME)
-    hours = uptime // 3600
-    minutes = (uptime % 3600) // 60
-    
-    return jsonify({
-        "uptime": f"{hours}h {minutes}m",
-        "status": "online",
-        "cache_size": len(response_cache),
-        "definition_cache_size": len(definition_cache),
-        "active_sessions": len(session) if hasattr(session, 'keys') else 0
-    })
+    """Get server stats (body rebuilt at most once per second)"""
+    global _stats_cache
+    now = int(time.time())
+    if _stats_cache[0] != now:
+        uptime = now - int(START_TIME)
+        hours = uptime // 3600
+        minutes = (uptime % 3600) // 60
+        
+        _stats_cache = (now, orjson.dumps({
+            "uptime": f"{hours}h {minutes}m",
+            "status": "online",
+            "cache_size": len(response_cache),
+            "definition_cache_size": len(definition_cache)
+        }))
+    return app.response_class(_stats_cache[1], mimetype='application/json')
 
 @app.route('/api/clear_memory', methods=['POST'])
 def clear_memory():
     """Clear current user's memory"""
-    memory_key = get_memory_key()
-    if memory_key in session:
-        session.pop(memory_key, None)
+    clear_user_memory()
     
-    return jsonify({"success": True, "message": "Memory cleared!"})
+    return json_response({"success": True, "message": "Memory cleared!"})
 
 @app.route('/health')
 def health():
     """Health check endpoint"""
-    return jsonify({
+    return json_response({
         "status": "healthy",
         "service": "Miss Tristin AI",
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": now_iso(),
         "version": "2.0.0"
     })
 
 # ===== ERROR HANDLERS =====
 @app.errorhandler(400)
 def bad_request(error):
-    return jsonify({"error": "Bad request", "message": "Check your input"}), 400
+    return json_response({"error": "Bad request", "message": "Check your input"}, 400)
 
 @app.errorhandler(404)
 def not_found(error):
-    return jsonify({"error": "Route not found", "message": "What are you looking for? 🤔"}), 404
+    return json_response({"error": "Route not found", "message": "What are you looking for? 🤔"}, 404)
 
 @app.errorhandler(429)
 def too_many_requests(error):
-    return jsonify({"error": "Too many requests", "message": "Slow down! I need breaks too! 😅"}), 429
+    return json_response({"error": "Too many requests", "message": "Slow down! I need breaks too! 😅"}, 429)
 
 @app.errorhandler(500)
 def server_error(error):
     logger.error(f"Server error: {error}")
-    return jsonify({"error": "Internal server error", "message": "Oops! Something went wrong on my end! 🔧"}), 500
+    return json_response({"error": "Internal server error", "message": "Oops! Something went wrong on my end! 🔧"}, 500)
 
 # ===== APPLICATION INITIALIZATION =====
+SESSIONLESS_PATHS = frozenset({'/health', '/api/stats'})
+
 @app.before_request
 def before_request():
     """Initialize session if needed"""
+    # Probes and monitoring don't need a user, and shouldn't get a cookie
+    if request.path in SESSIONLESS_PATHS:
+        return
     if 'initialized' not in session:
         session['initialized'] = True
-        get_user_id()  # Ensure user has an ID
+    get_memory_key()  # Ensures the user has an ID; memoizes the key on g
+
+# ===== GC TUNING =====
+# Everything built above lives for the whole process: move it out of the
+# collector's generations so gen-2 passes stay short, and collect gen 0 less
+# often since each request allocates many short-lived dicts
+gc.collect()
+gc.freeze()
+gc.set_threshold(10_000, 20, 20)
 
 # ===== MAIN =====
+# Development server only; production runs `gunicorn -c gunicorn.conf.py app:app`
 if __name__ == '__main__':
     # Print startup info
     print("\n" + "="*50)
@@ -574,9 +1009,9 @@ if __name__ == '__main__':
     print("="*50)
     print(f"📝 Debug mode: {debug_mode}")
     print(f"🔐 Secure cookies: {app.config['SESSION_COOKIE_SECURE']}")
-    print(f"💾 Memory system: Active (session-based)")
+    print(f"💾 Memory system: Active ({'redis' if redis_client else 'session-based'})")
     print(f"⚡ Rate limiting: Active ({rate_limiter.max_requests} req/min)")
-    print(f"🗑️  Cleanup thread: Running")
+    print(f"🗑️  Cache expiry: Lazy (on access and near capacity)")
     print(f"🔑 API Key: {'Configured' if GROQ_KEY and GROQ_KEY != 'your_groq_api_key_here' else 'MISSING!'}")
     print("="*50)
     
@@ -0,0 +1,32 @@
+# Gunicorn settings for production: gunicorn -c gunicorn.conf.py app:app
+import os
+import sys
+import multiprocessing
+from dotenv import load_dotenv
+
+load_dotenv()  # same .env app.py reads, so SECRET_KEY is seen here too
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+
+# Threaded workers: Groq calls are I/O-bound, so threads overlap the waiting
+# while processes spread the Python work across cores. GUNICORN_WORKER_CLASS=gevent
+# swaps threads for greenlets (pip install gevent); gunicorn patches the
+# standard library itself before loading the app, so app.py needs no changes
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', "gthread")
+# Sessions are signed with SECRET_KEY; without one each worker invents its own
+# and rejects the others' cookies, so stay on a single worker until it is set
+default_workers = multiprocessing.cpu_count() * 2 + 1 if os.getenv('SECRET_KEY') else 1
+workers = int(os.getenv('WEB_CONCURRENCY', default_workers))
+if workers > 1 and not os.getenv('SECRET_KEY'):
+    print("❌ SECRET_KEY is not set: sessions will break across workers", file=sys.stderr)
+elif not os.getenv('SECRET_KEY'):
+    print("⚠️  SECRET_KEY is not set: running 1 worker; set it to scale out", file=sys.stderr)
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))  # open connections per worker, any class
+
+# Above the 20s Groq read timeout so slow completions aren't killed mid-reply
+timeout = 30
+keepalive = 30
+
+accesslog = "-"
+errorlog = "-"